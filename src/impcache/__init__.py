@@ -2,15 +2,33 @@
 
 __version__ = "1.0.2"
 
-from .exceptions import CacheError, JsonEncodeError, JsonDecodeError
+from .exceptions import CacheError, EncodeError, DecodeError, JsonEncodeError, JsonDecodeError
 from .repository import RedisCacheRepository
+from .serializer import (
+    ISerializer,
+    JsonSerializer,
+    CompactIntJsonSerializer,
+    SsrjsonSerializer,
+    MsgpackSerializer,
+    OrmsgpackSerializer,
+    CborSerializer,
+)
 from .service import ICache, Cache
 
 __all__ = [
     "ICache",
     "Cache",
     "RedisCacheRepository",
+    "ISerializer",
+    "JsonSerializer",
+    "CompactIntJsonSerializer",
+    "SsrjsonSerializer",
+    "MsgpackSerializer",
+    "OrmsgpackSerializer",
+    "CborSerializer",
     "CacheError",
+    "EncodeError",
+    "DecodeError",
     "JsonEncodeError",
     "JsonDecodeError",
 ]
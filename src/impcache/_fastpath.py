@@ -0,0 +1,57 @@
+"""
+Serialization glue executed on every cache operation.
+
+The module is fully typed so that it can be compiled with mypyc (see the build-python-package-mypyc make target),
+the compiled extension takes precedence over this file on import when it is installed.
+"""
+
+from typing import Optional, Sequence, TypeAlias
+from uuid import UUID
+
+import orjson
+
+from .exceptions import JsonDecodeError, JsonEncodeError
+
+JSON: TypeAlias = dict[str, "JSON"] | list["JSON"] | str | int | float | bool | UUID | None
+# Everything orjson.loads accepts, the compiled module checks argument types against the annotations
+Payload: TypeAlias = bytes | bytearray | memoryview
+
+_dumps = orjson.dumps
+_loads = orjson.loads
+# numpy arrays and scalars are serialized natively instead of raising JsonEncodeError
+_DUMPS_OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+# Serialized forms of singletons, returned without entering the encoder (flags, gates, cached misses)
+_NULL = b"null"
+_TRUE = b"true"
+_FALSE = b"false"
+
+
+def json_dumps(json: JSON) -> bytes:
+    if json is None:
+        return _NULL
+    if json is True:
+        return _TRUE
+    if json is False:
+        return _FALSE
+    try:
+        result = _dumps(json, option=_DUMPS_OPTIONS)
+    except orjson.JSONEncodeError as exc_info:
+        raise JsonEncodeError from exc_info
+    return result
+
+
+def json_loads(payload: Payload | str) -> JSON:
+    try:
+        json = _loads(payload)
+    except orjson.JSONDecodeError as exc_info:
+        raise JsonDecodeError from exc_info
+    return json
+
+
+def json_loads_many(payloads: Sequence[Optional[Payload]]) -> list[JSON]:
+    loads = _loads
+    try:
+        # Misses are checked inline, a per item function call doubles the cost of mostly empty results
+        return [None if payload is None else loads(payload) for payload in payloads]
+    except orjson.JSONDecodeError as exc_info:
+        raise JsonDecodeError from exc_info
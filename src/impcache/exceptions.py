@@ -2,9 +2,17 @@ class CacheError(Exception):
     pass
 
 
-class JsonEncodeError(CacheError):
+class EncodeError(CacheError):
     pass
 
 
-class JsonDecodeError(CacheError):
+class DecodeError(CacheError):
+    pass
+
+
+class JsonEncodeError(EncodeError):
+    pass
+
+
+class JsonDecodeError(DecodeError):
     pass
@@ -1,12 +1,44 @@
-from abc import abstractmethod
-from typing import Optional, Literal
+from typing import Any, Literal, Mapping, Optional, Protocol, Sequence, TypeAlias
 
-from .tools import RedisSession, RedisConnection
+from .tools import AutoPipeline, RedisSession, get_redis_connection
 
+# Keys may be passed already encoded, redis-py sends bytes as is
+Key: TypeAlias = str | bytes
 
-class IRepository:
-    @abstractmethod
-    async def set(self, key: str, value: bytes, expire: int) -> Literal[True]:
+# A repository method call executed in a pipeline: method name (set, set_nx, get or delete) and keyword arguments
+Operation: TypeAlias = tuple[str, dict[str, Any]]
+
+# Default maximum number of keys removed by a single UNLINK command in delete_pattern
+UNLINK_CHUNK_SIZE = 10000
+
+# Sets every KEYS[i] to ARGV[i + 1] with ARGV[1] seconds expiration in a single command
+SET_MANY_SCRIPT = """
+for i = 1, #KEYS do
+    redis.call("SET", KEYS[i], ARGV[i + 1], "EX", ARGV[1])
+end
+return 1
+"""
+
+# Sets every KEYS[i] to ARGV[i + 1] with ARGV[1] seconds expiration if it doesn't exist, returns 1 or 0 for every key
+SET_NX_MANY_SCRIPT = """
+local result = {}
+for i = 1, #KEYS do
+    result[i] = redis.call("SET", KEYS[i], ARGV[i + 1], "EX", ARGV[1], "NX") and 1 or 0
+end
+return result
+"""
+
+# Deletes KEYS[1] only if it holds ARGV[1], returns the number of keys removed
+DELETE_IF_EQUAL_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class IRepository(Protocol):
+    async def set(self, key: Key, value: bytes, expire: int) -> Literal[True]:
         """
         Set the value at key name to value with expiration
         :param key: Key name
@@ -15,8 +47,7 @@ class IRepository:
         :return: True
         """
 
-    @abstractmethod
-    async def set_nx(self, key: str, value: bytes, expire: int) -> bool:
+    async def set_nx(self, key: Key, value: bytes, expire: int) -> bool:
         """
         Set the value at key name to value with expiration only if key does not exist
         :param key: Key name
@@ -25,8 +56,7 @@ class IRepository:
         :return: False if key exists, True otherwise
         """
 
-    @abstractmethod
-    async def set_many(self, data: dict[str, bytes], expire: int) -> Literal[True]:
+    async def set_many(self, data: Mapping[str, bytes] | Mapping[bytes, bytes], expire: int) -> Literal[True]:
         """
         Sets key/values based on a data dict
         :param data: dict with key/value
@@ -34,16 +64,22 @@ class IRepository:
         :return: True
         """
 
-    @abstractmethod
-    async def get(self, key: str) -> Optional[bytes]:
+    async def set_nx_many(self, data: Mapping[str, bytes] | Mapping[bytes, bytes], expire: int) -> list[bool]:
+        """
+        Sets key/values based on a data dict, every key is set only if it does not exist
+        :param data: dict with key/value
+        :param expire: Expiration time, in seconds
+        :return: Returns a list ordered identically to data keys, False for every key that exists, True otherwise
+        """
+
+    async def get(self, key: Key) -> Optional[bytes]:
         """
         Return the value at key name, or None if the key doesn't exist
         :param key: Key name
         :return: Value or None
         """
 
-    @abstractmethod
-    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+    async def get_many(self, keys: Sequence[Key]) -> list[Optional[bytes]]:
         """
         Returns a list of values
         :param keys: List of keys
@@ -51,23 +87,28 @@ class IRepository:
         that does not hold a value or does not exist, None is returned
         """
 
-    @abstractmethod
-    async def delete(self, key) -> int:
+    async def delete(self, key: Key) -> int:
         """
         Delete the key
         :param key: Key name
         :return: Amount of keys removed (1 or 0)
         """
 
-    @abstractmethod
-    async def delete_many(self, keys: list[str]) -> int:
+    async def delete_if_equal(self, key: Key, value: bytes) -> int:
+        """
+        Delete the key only if it holds the value
+        :param key: Key name
+        :param value: Bytes
+        :return: Amount of keys removed (1 or 0)
+        """
+
+    async def delete_many(self, keys: Sequence[Key]) -> int:
         """
         Delete keys specified by keys list
         :param keys: List of keys
         :return: Amount of keys removed
         """
 
-    @abstractmethod
     async def delete_pattern(self, pattern: str) -> int:
         """
         Delete keys specified by pattern
@@ -83,57 +124,113 @@ class IRepository:
         :return: Amount of keys removed
         """
 
+    async def execute_pipeline(self, operations: Sequence[Operation]) -> list[Any]:
+        """
+        Execute several operations in a single round-trip
+        :param operations: List of (method name, keyword arguments) tuples, supported methods are
+        set, set_nx, get and delete
+        :return: Returns a list of results ordered identically to operations, each result is the same
+        as returned by the corresponding method
+        """
+
+    async def close(self) -> None:
+        """
+        Close the repository and release all underlying connections
+        """
+
 
-class RedisCacheRepository(IRepository):
-    def __init__(self, dsn: str):
-        self.session = RedisSession(
-            connection=RedisConnection(dsn=dsn).connection,
-        )
+class RedisCacheRepository:
+    def __init__(
+        self, dsn: str, auto_pipeline: bool = False, scan_count: int = 10000, unlink_chunk_size: int = UNLINK_CHUNK_SIZE
+    ):
+        connection = get_redis_connection(dsn)
+        self.session = RedisSession(connection=connection)
+        self._scan_count = scan_count
+        self._unlink_chunk_size = unlink_chunk_size
+        self._set_many_script = connection.register_script(SET_MANY_SCRIPT)
+        self._set_nx_many_script = connection.register_script(SET_NX_MANY_SCRIPT)
+        self._delete_if_equal_script = connection.register_script(DELETE_IF_EQUAL_SCRIPT)
+        self._auto_pipeline = AutoPipeline(session=self.session) if auto_pipeline else None
 
-    async def set(self, key: str, value: bytes, expire: int) -> Literal[True]:
+    async def _execute_command(self, command: str, *args, **kwargs) -> Any:
+        if self._auto_pipeline is not None:
+            return await self._auto_pipeline.execute(command, *args, **kwargs)
         async with self.session as session:
-            await session.set(name=key, value=value, ex=expire)
+            return await getattr(session, command)(*args, **kwargs)
+
+    async def set(self, key: Key, value: bytes, expire: int) -> Literal[True]:
+        await self._execute_command("set", name=key, value=value, ex=expire)
         return True
 
-    async def set_nx(self, key: str, value: bytes, expire: int) -> bool:
-        async with self.session as session:
-            result = await session.set(name=key, value=value, ex=expire, nx=True)
+    async def set_nx(self, key: Key, value: bytes, expire: int) -> bool:
+        result = await self._execute_command("set", name=key, value=value, ex=expire, nx=True)
         return result is not None
 
-    async def set_many(self, data: dict[str, bytes], expire: int) -> Literal[True]:
-        async with self.session as session:
-            async with session.pipeline(transaction=True) as pipe:
-                await pipe.mset(data)  # type: ignore
-                for key in data.keys():
-                    await pipe.expire(name=key, time=expire)
-                await pipe.execute()
+    async def set_many(self, data: Mapping[str, bytes] | Mapping[bytes, bytes], expire: int) -> Literal[True]:
+        await self._set_many_script(keys=list(data.keys()), args=[expire, *data.values()])
         return True
 
-    async def get(self, key: str) -> Optional[bytes]:
-        async with self.session as session:
-            return await session.get(name=key)
+    async def set_nx_many(self, data: Mapping[str, bytes] | Mapping[bytes, bytes], expire: int) -> list[bool]:
+        result = await self._set_nx_many_script(keys=list(data.keys()), args=[expire, *data.values()])
+        return [bool(item) for item in result]
 
-    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
-        async with self.session as session:
-            return await session.mget(keys=keys)
+    async def get(self, key: Key) -> Optional[bytes]:
+        return await self._execute_command("get", name=key)
 
-    async def delete(self, key) -> int:
-        async with self.session as session:
-            return await session.delete(key)
+    async def get_many(self, keys: Sequence[Key]) -> list[Optional[bytes]]:
+        return await self._execute_command("mget", keys=keys)
 
-    async def delete_many(self, keys: list[str]) -> int:
-        async with self.session as session:
-            return await session.delete(*keys)
+    async def delete(self, key: Key) -> int:
+        return await self._execute_command("delete", key)
+
+    async def delete_if_equal(self, key: Key, value: bytes) -> int:
+        return await self._delete_if_equal_script(keys=[key], args=[value])
+
+    async def delete_many(self, keys: Sequence[Key]) -> int:
+        return await self._execute_command("delete", *keys)
 
     async def delete_pattern(self, pattern: str) -> int:
-        chunk_size: int = 1000
         removed_keys: int = 0
+        chunk_size = self._unlink_chunk_size
         async with self.session as session:
-            cursor: int = 0
-            while True:
-                cursor, keys = await session.scan(cursor, match=pattern, count=chunk_size)
-                if keys:
-                    removed_keys += await session.delete(*keys)
-                if cursor == 0:
-                    break
+            if not any(char in pattern for char in "*?[\\"):
+                # A pattern without glob special characters matches a single key only
+                return await session.unlink(pattern)
+            cursor, keys = await session.scan(0, match=pattern, count=self._scan_count)
+            while cursor != 0:
+                if len(keys) < chunk_size:
+                    # Collect matches over several pages to unlink them with as few commands as possible
+                    cursor, page = await session.scan(cursor, match=pattern, count=self._scan_count)
+                    keys += page
+                    continue
+                # Unlink a full chunk and fetch the next page in a single round-trip
+                async with self.session.pipeline() as pipe:
+                    pipe.unlink(*keys[:chunk_size])
+                    pipe.scan(cursor, match=pattern, count=self._scan_count)
+                    unlinked, (cursor, page) = await pipe.execute()
+                removed_keys += unlinked
+                keys = keys[chunk_size:] + page
+            while keys:
+                removed_keys += await session.unlink(*keys[:chunk_size])
+                keys = keys[chunk_size:]
         return removed_keys
+
+    async def execute_pipeline(self, operations: Sequence[Operation]) -> list[Any]:
+        async with self.session.pipeline() as pipe:
+            for method, kwargs in operations:
+                if method in ("set", "set_nx"):
+                    pipe.set(name=kwargs["key"], value=kwargs["value"], ex=kwargs["expire"], nx=method == "set_nx")
+                elif method == "get":
+                    pipe.get(name=kwargs["key"])
+                elif method == "delete":
+                    pipe.delete(kwargs["key"])
+                else:
+                    raise ValueError(f"Unsupported pipeline operation: {method}")
+            results = await pipe.execute()
+        # SET with NX replies None if the key exists
+        return [
+            result is not None if method == "set_nx" else result for (method, _), result in zip(operations, results)
+        ]
+
+    async def close(self) -> None:
+        await self.session.close()
@@ -0,0 +1,192 @@
+from functools import partial
+from typing import Any, Callable, Optional, Protocol
+from uuid import UUID
+
+from ._fastpath import json_dumps, json_loads, json_loads_many
+from .exceptions import DecodeError, EncodeError, JsonDecodeError, JsonEncodeError
+
+
+class ISerializer(Protocol):
+    def dumps(self, value: Any) -> bytes:
+        """
+        Serializes the value
+        :param value: Value to serialize
+        :return: Bytes
+        """
+
+    def loads(self, payload: bytes) -> Any:
+        """
+        Deserializes the payload
+        :param payload: Bytes
+        :return: Value
+        """
+
+    def loads_many(self, payloads: list[Optional[bytes]]) -> list[Any]:
+        """
+        Deserializes a list of payloads
+        :param payloads: List of bytes or None
+        :return: Returns a list of values ordered identically to payloads, None payloads are returned as None
+        """
+
+
+class _SerializerBase:
+    """
+    Provides loads_many on top of the loads method implemented by subclasses
+    """
+
+    __slots__ = ()
+
+    loads: Callable[[bytes], Any]
+
+    def loads_many(self, payloads: list[Optional[bytes]]) -> list[Any]:
+        loads = self.loads
+        return [None if payload is None else loads(payload) for payload in payloads]
+
+
+class JsonSerializer:
+    __slots__ = ()
+
+    dumps = staticmethod(json_dumps)
+    loads = staticmethod(json_loads)
+    loads_many = staticmethod(json_loads_many)
+
+
+class CompactIntJsonSerializer(_SerializerBase):
+    """
+    JSON serializer storing small integer values (counters, flags) as a tagged binary int16 or int8,
+    for example 1000 is stored as b"i\\x03\\xe8" instead of b"1000". Integers with a JSON form of at most
+    two bytes are left as is, all other values are serialized to JSON.
+    Tagged payloads can't be decoded by JsonSerializer, both serializers must not share a key prefix.
+    """
+
+    __slots__ = ()
+
+    @staticmethod
+    def dumps(value: Any) -> bytes:
+        # bool is a subclass of int, but must be stored as JSON
+        if value.__class__ is int and -32768 <= value <= 32767 and not -10 < value < 100:
+            return b"i" + value.to_bytes(1 if -128 <= value <= 127 else 2, "big", signed=True)
+        return json_dumps(value)
+
+    @staticmethod
+    def loads(payload: bytes) -> Any:
+        # A JSON document never starts with "i"
+        if payload[:1] == b"i" and 2 <= len(payload) <= 3:
+            return int.from_bytes(payload[1:], "big", signed=True)
+        return json_loads(payload)
+
+
+class SsrjsonSerializer(_SerializerBase):
+    """
+    JSON serializer backed by ssrjson, which uses SIMD instructions for encoding and UTF-8 validation.
+    Its output is readable by JsonSerializer and vice versa, but not byte-identical, for example 1e20 is written
+    as 1e+20. NaN and infinity are written as null like JsonSerializer does. UUID and numpy values are not supported.
+    """
+
+    def __init__(self):
+        import ssrjson  # pylint: disable=import-outside-toplevel
+
+        self._dumps = ssrjson.dumps_to_bytes
+        self._loads = ssrjson.loads
+        self._encode_error = ssrjson.JSONEncodeError
+        self._decode_error = ssrjson.JSONDecodeError
+
+    def dumps(self, value: Any) -> bytes:
+        try:
+            result = self._dumps(value)
+        except self._encode_error as exc_info:
+            raise JsonEncodeError from exc_info
+        if b"NaN" in result or b"Infinity" in result:
+            # ssrjson writes non-finite floats as NaN/Infinity literals, which are not valid JSON,
+            # the rare payloads containing them (or such strings) are encoded with orjson instead
+            return json_dumps(value)
+        return result
+
+    def loads(self, payload: bytes) -> Any:
+        try:
+            value = self._loads(payload)
+        except self._decode_error as exc_info:
+            raise JsonDecodeError from exc_info
+        return value
+
+
+def _msgpack_default(value: Any) -> Any:
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not MessagePack serializable")
+
+
+class MsgpackSerializer(_SerializerBase):
+    def __init__(self):
+        import msgpack  # type: ignore # pylint: disable=import-outside-toplevel
+
+        self._packb = partial(msgpack.packb, default=_msgpack_default)
+        self._unpackb = partial(msgpack.unpackb, raw=False)
+
+    def dumps(self, value: Any) -> bytes:
+        try:
+            result = self._packb(value)
+        except (TypeError, ValueError, OverflowError) as exc_info:
+            raise EncodeError from exc_info
+        return result
+
+    def loads(self, payload: bytes) -> Any:
+        try:
+            value = self._unpackb(payload)
+        except (TypeError, ValueError) as exc_info:
+            raise DecodeError from exc_info
+        return value
+
+
+class OrmsgpackSerializer(_SerializerBase):
+    """
+    MessagePack serializer backed by ormsgpack, which is implemented in Rust and is several times faster than msgpack.
+    Produces the same output as MsgpackSerializer for dictionaries with str keys, UUID values are serialized natively
+    as strings. Other dictionary keys raise EncodeError, MsgpackSerializer writes them but can't read them back either.
+    """
+
+    def __init__(self):
+        import ormsgpack  # pylint: disable=import-outside-toplevel
+
+        self._packb = partial(ormsgpack.packb, option=ormsgpack.OPT_SERIALIZE_NUMPY)
+        self._unpackb = ormsgpack.unpackb
+        self._encode_error = ormsgpack.MsgpackEncodeError
+        self._decode_error = ormsgpack.MsgpackDecodeError
+
+    def dumps(self, value: Any) -> bytes:
+        try:
+            result = self._packb(value)
+        except self._encode_error as exc_info:
+            raise EncodeError from exc_info
+        return result
+
+    def loads(self, payload: bytes) -> Any:
+        try:
+            value = self._unpackb(payload)
+        except self._decode_error as exc_info:
+            raise DecodeError from exc_info
+        return value
+
+
+class CborSerializer(_SerializerBase):
+    def __init__(self):
+        import cbor2  # pylint: disable=import-outside-toplevel
+
+        self._dumps = cbor2.dumps
+        self._loads = cbor2.loads
+        self._encode_errors = (cbor2.CBOREncodeError, TypeError, ValueError)
+        self._decode_errors = (cbor2.CBORDecodeError, TypeError, ValueError)
+
+    def dumps(self, value: Any) -> bytes:
+        try:
+            result = self._dumps(value)
+        except self._encode_errors as exc_info:
+            raise EncodeError from exc_info
+        return result
+
+    def loads(self, payload: bytes) -> Any:
+        try:
+            value = self._loads(payload)
+        except self._decode_errors as exc_info:
+            raise DecodeError from exc_info
+        return value
@@ -1,25 +1,39 @@
-from abc import ABC, abstractmethod
-from typing import TypeAlias, Optional, Literal
-from uuid import UUID
+import asyncio
+import sys
+from uuid import uuid4
+from typing import Any, Awaitable, Callable, Iterable, Literal, Optional, Protocol
 
-import orjson
+from ._fastpath import JSON
+from .repository import IRepository, Operation
+from .serializer import ISerializer, JsonSerializer
+from .tools import NegativeCache
 
-from .exceptions import JsonDecodeError, JsonEncodeError
-from .repository import IRepository
+# Kept for backward compatibility, JSON serialization is provided by the serializer passed to Cache
+JsonSerializerMixin = JsonSerializer
 
-JSON: TypeAlias = dict[str, "JSON"] | list["JSON"] | str | int | float | bool | UUID | None
+# get_or_set: lifetime of the lock held by the worker computing the value, in seconds
+GET_OR_SET_LOCK_EXPIRE = 30
+# get_or_set: how many times and how often other workers check for the computed value
+GET_OR_SET_POLL_ATTEMPTS = 50
+GET_OR_SET_POLL_INTERVAL = 0.02
+# Maximum number of memoized key prefixes for explicitly passed versions
+MAX_VERSION_PREFIXES = 64
 
 
-class ICache(ABC):
-    def __init__(self, key_prefix: str = "cache", version: int | str = 1):
-        self.key_prefix = key_prefix
-        self.version = version
+class ICache(Protocol):
+    """
+    Cache interface, implementations conform to it structurally and are checked statically (e.g. with mypy).
+    It is not runtime checkable, isinstance checks against it raise TypeError.
+    """
 
-    def make_key(self, key: str, version: Optional[int | str] = None):
-        key_version = version if version is not None else self.version
-        return f"{self.key_prefix}:{key_version}:{key}"
+    def make_key(self, key: str, version: Optional[int | str] = None) -> str:
+        """
+        Returns the final cache key, combined from the key prefix, the version and the key name
+        :param key: Key name
+        :param version: Optional cache version
+        :return: Cache key
+        """
 
-    @abstractmethod
     async def set(self, key: str, value: JSON, expire: int, version: Optional[int | str] = None) -> Literal[True]:
         """
         Sets the value at key name to value with expiration
@@ -30,7 +44,6 @@ class ICache(ABC):
         :return: True
         """
 
-    @abstractmethod
     async def set_nx(self, key: str, value: JSON, expire: int, version: Optional[int | str] = None) -> bool:
         """
         Sets the value at key name to value with expiration only if key does not exist
@@ -41,7 +54,6 @@ class ICache(ABC):
         :return: False if key exists, True otherwise
         """
 
-    @abstractmethod
     async def set_many(self, data: dict[str, JSON], expire: int, version: Optional[int | str] = None) -> Literal[True]:
         """
         Sets key/values based on a data dict
@@ -51,7 +63,26 @@ class ICache(ABC):
         :return: True
         """
 
-    @abstractmethod
+    async def set_nx_many(self, data: dict[str, JSON], expire: int, version: Optional[int | str] = None) -> list[bool]:
+        """
+        Sets key/values based on a data dict, every key is set only if it does not exist
+        :param data: dict with key/value
+        :param expire: Expiration time, in seconds
+        :param version: Optional cache version
+        :return: Returns a list ordered identically to data keys, False for every key that exists, True otherwise
+        """
+
+    async def set_raw_many(
+        self, data: dict[str, bytes], expire: int, version: Optional[int | str] = None
+    ) -> Literal[True]:
+        """
+        Sets key/values based on a data dict with already serialized values, values are stored as is
+        :param data: dict with key/serialized value
+        :param expire: Expiration time, in seconds
+        :param version: Optional cache version
+        :return: True
+        """
+
     async def get(self, key: str, version: Optional[int | str] = None) -> Optional[JSON]:
         """
         Returns the value at key name, or None if the key doesn't exist
@@ -60,7 +91,25 @@ class ICache(ABC):
         :return: Value or None
         """
 
-    @abstractmethod
+    async def get_or_set(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[JSON]],
+        expire: int,
+        version: Optional[int | str] = None,
+    ) -> JSON:
+        """
+        Returns the value at key name, if the key doesn't exist sets it to the result of factory
+
+        Only one caller at a time computes a missing value, concurrent callers wait for it to appear
+        in the cache and compute it themselves only if it doesn't appear in time.
+        :param key: Key name
+        :param factory: Async callable returning JSON-serializable data
+        :param expire: Expiration time, in seconds
+        :param version: Optional cache version
+        :return: Value
+        """
+
     async def get_many(self, keys: list[str], version: Optional[int | str] = None) -> list[Optional[JSON]]:
         """
         Returns a list of values
@@ -70,7 +119,6 @@ class ICache(ABC):
         that does not hold a value or does not exist, None is returned
         """
 
-    @abstractmethod
     async def delete(self, key: str, version: Optional[int | str] = None) -> int:
         """
         Deletes the key
@@ -79,7 +127,6 @@ class ICache(ABC):
         :return: Number of keys removed (1 or 0)
         """
 
-    @abstractmethod
     async def delete_many(self, keys: list[str], version: Optional[int | str] = None) -> int:
         """
         Deletes keys specified by keys list
@@ -88,7 +135,6 @@ class ICache(ABC):
         :return: Number of keys removed
         """
 
-    @abstractmethod
     async def delete_pattern(self, pattern: str, version: Optional[int | str] = None) -> int:
         """
         Deletes keys specified by pattern
@@ -105,60 +151,257 @@ class ICache(ABC):
         :return: Number of keys removed
         """
 
+    def pipeline(self) -> "CachePipeline":
+        """
+        Returns a pipeline queuing set, set_nx, get and delete operations, queued operations are executed
+        in a single round-trip when the pipeline is executed or the context manager exits
+        :return: CachePipeline
+        """
+
+    async def close(self) -> None:
+        """
+        Closes the cache and releases all underlying connections
+        """
+
+
+class CachePipeline:
+    """
+    Queues cache operations and executes them with a single repository call.
+
+    Usage:
+        async with cache.pipeline() as pipe:
+            pipe.set("key1", "value1", expire=60)
+            pipe.get("key2")
+            results = await pipe.execute()  # [True, "value2"]
+    Operations left in the pipeline are executed when the context manager exits without an error.
+    """
+
+    __slots__ = ("_repository", "_serializer", "_make_key", "_forget_misses", "_operations")
+
+    def __init__(
+        self,
+        repository: IRepository,
+        serializer: ISerializer,
+        make_key: Callable[[str, Optional[int | str]], str],
+        forget_misses: Callable[[Iterable[str]], None],
+    ):
+        self._repository = repository
+        self._serializer = serializer
+        self._make_key = make_key
+        self._forget_misses = forget_misses
+        self._operations: list[Operation] = []
+
+    async def __aenter__(self) -> "CachePipeline":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            await self.execute()
+        else:
+            self._operations.clear()
+
+    def set(self, key: str, value: JSON, expire: int, version: Optional[int | str] = None) -> None:
+        _key = self._make_key(key, version)
+        self._forget_misses((_key,))
+        self._operations.append(("set", {"key": _key, "value": self._serializer.dumps(value), "expire": expire}))
+
+    def set_nx(self, key: str, value: JSON, expire: int, version: Optional[int | str] = None) -> None:
+        _key = self._make_key(key, version)
+        self._forget_misses((_key,))
+        self._operations.append(("set_nx", {"key": _key, "value": self._serializer.dumps(value), "expire": expire}))
+
+    def get(self, key: str, version: Optional[int | str] = None) -> None:
+        self._operations.append(("get", {"key": self._make_key(key, version)}))
+
+    def delete(self, key: str, version: Optional[int | str] = None) -> None:
+        self._operations.append(("delete", {"key": self._make_key(key, version)}))
+
+    async def execute(self) -> list[Any]:
+        """
+        Executes queued operations
+        :return: Returns a list of results ordered identically to the queued operations, each result is the same
+        as returned by the corresponding Cache method
+        """
+        operations, self._operations = self._operations, []
+        if not operations:
+            return []
+        results = await self._repository.execute_pipeline(operations=operations)
+        loads = self._serializer.loads
+        return [
+            loads(result) if method == "get" and result is not None else result
+            for (method, _), result in zip(operations, results)
+        ]
+
+
+class _CacheBase:
+    __slots__ = ("_key_prefix", "_version", "_default_prefix", "_version_prefixes")
+
+    def __init__(self, key_prefix: str = "cache", version: int | str = 1):
+        self._key_prefix = sys.intern(key_prefix)
+        self._version = version
+        self._default_prefix = self._build_prefix(version)
+        self._version_prefixes: dict[int | str, str] = {}
 
-class JsonSerializerMixin:
-    @staticmethod
-    def loads(payload: bytes) -> JSON:
-        try:
-            json = orjson.loads(payload)
-        except orjson.JSONDecodeError as exc_info:
-            raise JsonDecodeError from exc_info
-        return json
+    @property
+    def key_prefix(self) -> str:
+        return self._key_prefix
 
-    @staticmethod
-    def dumps(json: JSON) -> bytes:
-        try:
-            result = orjson.dumps(json)
-        except TypeError as exc_info:
-            raise JsonEncodeError from exc_info
-        return result
+    @key_prefix.setter
+    def key_prefix(self, value: str) -> None:
+        self._key_prefix = sys.intern(value)
+        self._default_prefix = self._build_prefix(self._version)
+        self._version_prefixes.clear()
 
+    @property
+    def version(self) -> int | str:
+        return self._version
+
+    @version.setter
+    def version(self, value: int | str) -> None:
+        self._version = value
+        self._default_prefix = self._build_prefix(value)
+
+    def make_key(self, key: str, version: Optional[int | str] = None) -> str:
+        if version is None:
+            return self._default_prefix + key
+        return self._version_prefix(version) + key
+
+    def _make_keys(self, keys: Iterable[str], version: Optional[int | str] = None) -> list[str]:
+        prefix = self._default_prefix if version is None else self._version_prefix(version)
+        return [prefix + key for key in keys]
+
+    def _build_prefix(self, version: int | str) -> str:
+        # Prefixes are long-lived and shared by every key, a single interned copy is kept
+        return sys.intern(f"{self._key_prefix}:{version}:")
+
+    def _version_prefix(self, version: int | str) -> str:
+        prefix = self._version_prefixes.get(version)
+        if prefix is None:
+            prefix = self._build_prefix(version)
+            # Versions are expected to be few, stop memoizing if they are generated dynamically
+            if len(self._version_prefixes) < MAX_VERSION_PREFIXES:
+                self._version_prefixes[version] = prefix
+        return prefix
+
+
+class Cache(_CacheBase):
+    __slots__ = ("_repository", "_serializer", "_negative_cache")
 
-class Cache(JsonSerializerMixin, ICache):
     def __init__(
         self,
         *args,
         repository: IRepository,
+        serializer: Optional[ISerializer] = None,
+        negative_cache_size: int = 0,
+        negative_cache_ttl: float = 5,
         **kwargs,
     ):
         super().__init__(*args, **kwargs)
         self._repository = repository
+        self._serializer = serializer if serializer is not None else JsonSerializer()
+        self._negative_cache = NegativeCache(negative_cache_size, negative_cache_ttl) if negative_cache_size else None
+
+    def _forget_misses(self, keys: Iterable[str]) -> None:
+        if self._negative_cache is not None:
+            for key in keys:
+                self._negative_cache.discard(key)
+
+    def dumps(self, value: Any) -> bytes:
+        return self._serializer.dumps(value)
+
+    def loads(self, payload: bytes) -> Any:
+        return self._serializer.loads(payload)
 
     async def set(self, key: str, value: JSON, expire: int, version: Optional[int | str] = None) -> Literal[True]:
-        return await self._repository.set(key=self.make_key(key, version), value=self.dumps(value), expire=expire)
+        _key = self.make_key(key, version)
+        self._forget_misses((_key,))
+        return await self._repository.set(key=_key, value=self._serializer.dumps(value), expire=expire)
 
     async def set_nx(self, key: str, value: JSON, expire: int, version: Optional[int | str] = None) -> bool:
-        return await self._repository.set_nx(key=self.make_key(key, version), value=self.dumps(value), expire=expire)
+        _key = self.make_key(key, version)
+        self._forget_misses((_key,))
+        return await self._repository.set_nx(key=_key, value=self._serializer.dumps(value), expire=expire)
 
     async def set_many(self, data: dict[str, JSON], expire: int, version: Optional[int | str] = None) -> Literal[True]:
-        _data = {}
-        for key, value in data.items():
-            _data[self.make_key(key, version)] = self.dumps(value)
+        dumps = self._serializer.dumps
+        _data = {key: dumps(value) for key, value in zip(self._make_keys(data.keys(), version), data.values())}
+        self._forget_misses(_data)
+        return await self._repository.set_many(data=_data, expire=expire)
+
+    async def set_nx_many(self, data: dict[str, JSON], expire: int, version: Optional[int | str] = None) -> list[bool]:
+        dumps = self._serializer.dumps
+        _data = {key: dumps(value) for key, value in zip(self._make_keys(data.keys(), version), data.values())}
+        self._forget_misses(_data)
+        return await self._repository.set_nx_many(data=_data, expire=expire)
+
+    async def set_raw_many(
+        self, data: dict[str, bytes], expire: int, version: Optional[int | str] = None
+    ) -> Literal[True]:
+        _data = dict(zip(self._make_keys(data.keys(), version), data.values()))
+        self._forget_misses(_data)
         return await self._repository.set_many(data=_data, expire=expire)
 
     async def get(self, key: str, version: Optional[int | str] = None) -> Optional[JSON]:
-        raw = await self._repository.get(key=self.make_key(key, version))
-        return self.loads(raw) if raw is not None else None
+        _key = self.make_key(key, version)
+        negative_cache = self._negative_cache
+        if negative_cache is not None and _key in negative_cache:
+            return None
+        raw = await self._repository.get(key=_key)
+        if raw is None:
+            if negative_cache is not None:
+                negative_cache.add(_key)
+            return None
+        return self._serializer.loads(raw)
+
+    async def get_or_set(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[JSON]],
+        expire: int,
+        version: Optional[int | str] = None,
+    ) -> JSON:
+        value = await self.get(key, version)
+        if value is not None:
+            return value
+        _key = self.make_key(key, version)
+        lock_key = f"{_key}:lock"
+        # A unique token prevents removing a lock taken by another worker after this one expired
+        lock_token = uuid4().hex.encode()
+        if await self._repository.set_nx(key=lock_key, value=lock_token, expire=GET_OR_SET_LOCK_EXPIRE):
+            try:
+                value = await factory()
+                await self.set(key, value, expire, version)
+            finally:
+                await self._repository.delete_if_equal(key=lock_key, value=lock_token)
+            return value
+        for _ in range(GET_OR_SET_POLL_ATTEMPTS):
+            await asyncio.sleep(GET_OR_SET_POLL_INTERVAL)
+            # Polls Redis directly, the miss above is already recorded in the negative cache
+            raw = await self._repository.get(key=_key)
+            if raw is not None:
+                self._forget_misses((_key,))
+                return self._serializer.loads(raw)
+        value = await factory()
+        # The value may have been set by the worker holding the lock in the meantime
+        self._forget_misses((_key,))
+        return value
 
     async def get_many(self, keys: list[str], version: Optional[int | str] = None) -> list[Optional[JSON]]:
-        data = await self._repository.get_many(keys=[self.make_key(key, version) for key in keys])
-        return [self.loads(value) if value is not None else None for value in data]
+        data = await self._repository.get_many(keys=self._make_keys(keys, version))
+        return self._serializer.loads_many(data)
 
     async def delete(self, key: str, version: Optional[int | str] = None) -> int:
-        return await self._repository.delete(key=self.make_key(key, version))
+        _key = self.make_key(key, version)
+        return await self._repository.delete(key=_key)
 
     async def delete_many(self, keys: list[str], version: Optional[int | str] = None) -> int:
-        return await self._repository.delete_many(keys=[self.make_key(key, version) for key in keys])
+        return await self._repository.delete_many(keys=self._make_keys(keys, version))
 
     async def delete_pattern(self, pattern: str, version: Optional[int | str] = None) -> int:
         return await self._repository.delete_pattern(pattern=self.make_key(pattern, version))
+
+    def pipeline(self) -> CachePipeline:
+        return CachePipeline(self._repository, self._serializer, self.make_key, self._forget_misses)
+
+    async def close(self) -> None:
+        await self._repository.close()
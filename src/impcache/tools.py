@@ -1,28 +1,138 @@
+import asyncio
+import contextlib
+import functools
+import socket
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator
+
 import redis.asyncio as aioredis
-from redis.asyncio.client import Redis
+from redis.asyncio.client import Pipeline, Redis
 
+# Detect dead idle connections after ~1 minute: first probe after 30s, then every 10s, give up after 3 failed probes.
+# Not every platform supports all options, unsupported ones are skipped.
+SOCKET_KEEPALIVE_OPTIONS = {
+    getattr(socket, option): value
+    for option, value in (("TCP_KEEPIDLE", 30), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3))
+    if hasattr(socket, option)
+}
 
-class SingletonMeta(type):
-    _instances: dict = {}
 
-    def __call__(cls, *args, **kwargs):
-        if cls not in cls._instances:
-            instance = super().__call__(*args, **kwargs)
-            cls._instances[cls] = instance
-        return cls._instances[cls]
+@functools.cache
+def get_redis_connection(dsn: str) -> Redis:
+    """
+    Returns a Redis client shared by all callers using the same DSN
+    """
+    return aioredis.from_url(
+        dsn,
+        socket_timeout=5,
+        socket_keepalive=True,
+        socket_keepalive_options=SOCKET_KEEPALIVE_OPTIONS,
+        retry_on_timeout=True,
+        health_check_interval=30,
+    )
 
 
-class RedisConnection(metaclass=SingletonMeta):
-    def __init__(self, dsn: str):
-        self.connection = aioredis.from_url(dsn)
+# Number of idle pipelines kept by a session for reuse
+MAX_IDLE_PIPELINES = 16
 
 
 class RedisSession:
     def __init__(self, connection: Redis):
         self._session = connection
+        self._pipelines: list[Pipeline] = []
 
     async def __aenter__(self) -> Redis:
         return self._session
 
     async def __aexit__(self, exc_type, exc_value, traceback) -> None:
-        await self._session.close()
+        # The connection pool is shared between calls, it is released only by close()
+        return None
+
+    @contextlib.asynccontextmanager
+    async def pipeline(self) -> AsyncIterator[Pipeline]:
+        """
+        Yields a non-transactional pipeline, pipelines are reset on exit and reused by subsequent calls
+        """
+        pipe = self._pipelines.pop() if self._pipelines else self._session.pipeline(transaction=False)
+        async with pipe:
+            yield pipe
+        if len(self._pipelines) < MAX_IDLE_PIPELINES:
+            self._pipelines.append(pipe)
+
+    async def close(self) -> None:
+        await self._session.close(close_connection_pool=True)
+
+
+class AutoPipeline:
+    """
+    Collects commands issued within the same event loop iteration and sends them to Redis as a single pipeline
+    """
+
+    def __init__(self, session: RedisSession):
+        self._session = session
+        self._pending: list[tuple[asyncio.Future, str, tuple, dict]] = []
+        self._tasks: set[asyncio.Task] = set()
+
+    async def execute(self, command: str, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self._pending:
+            loop.call_soon(self._flush)
+        self._pending.append((future, command, args, kwargs))
+        return await future
+
+    def _flush(self) -> None:
+        pending, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._execute_pending(pending))
+        # Keep a strong reference to the task until it is done
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _execute_pending(self, pending: list[tuple[asyncio.Future, str, tuple, dict]]) -> None:
+        try:
+            async with self._session.pipeline() as pipe:
+                for _, command, args, kwargs in pending:
+                    getattr(pipe, command)(*args, **kwargs)
+                results = await pipe.execute(raise_on_error=False)
+        except Exception as exc_info:  # pylint: disable=broad-except
+            for future, *_ in pending:
+                if not future.done():
+                    future.set_exception(exc_info)
+            return
+        for (future, *_), result in zip(pending, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+class NegativeCache:
+    """
+    Bounded set of recently missed keys, each key is remembered for ttl seconds
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._expires: OrderedDict[str, float] = OrderedDict()
+
+    def __contains__(self, key: str) -> bool:
+        expires = self._expires.get(key)
+        if expires is None:
+            return False
+        if expires > time.monotonic():
+            return True
+        del self._expires[key]
+        return False
+
+    def add(self, key: str) -> None:
+        self._expires[key] = time.monotonic() + self._ttl
+        self._expires.move_to_end(key)
+        if len(self._expires) > self._maxsize:
+            self._expires.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        self._expires.pop(key, None)
@@ -1,9 +1,12 @@
+import asyncio
 import os
+from unittest.mock import patch
 from uuid import uuid4
 
 import pytest
 import redis.asyncio as aioredis
 from impcache import RedisCacheRepository
+from impcache.tools import AutoPipeline, RedisSession, get_redis_connection
 
 REDIS_DSN = os.getenv("REDIS_DSN")
 
@@ -20,6 +23,12 @@ class TestRedisCacheRepository:
         yield repository
         await repository.session._session.connection_pool.disconnect()
 
+    @pytest.fixture
+    async def redis_auto_pipeline_repository(self):
+        repository = RedisCacheRepository(dsn=REDIS_DSN, auto_pipeline=True)
+        yield repository
+        await repository.session._session.connection_pool.disconnect()
+
     @pytest.fixture
     async def redis_connection(self):
         connection = aioredis.from_url(REDIS_DSN)
@@ -62,6 +71,23 @@ class TestRedisCacheRepository:
         assert await redis_connection.ttl(key2) == 100
         await redis_connection.delete(key1, key2)
 
+    @pytest.mark.anyio
+    async def test_can_set_nx_many(self, redis_repository, redis_connection):
+        key1 = self.get_key()
+        key2 = self.get_key()
+        await redis_connection.set(key1, b"test-nx-many-existing-value")
+        data = {
+            key1: b"test-nx-many-value1",
+            key2: b"test-nx-many-value2",
+        }
+        result = await redis_repository.set_nx_many(data, expire=100)
+        assert result == [False, True]
+        assert await redis_connection.get(key1) == b"test-nx-many-existing-value"
+        assert await redis_connection.ttl(key1) == -1
+        assert await redis_connection.get(key2) == b"test-nx-many-value2"
+        assert await redis_connection.ttl(key2) == 100
+        await redis_connection.delete(key1, key2)
+
     @pytest.mark.anyio
     async def test_can_get(self, redis_repository, redis_connection):
         key = self.get_key()
@@ -91,6 +117,15 @@ class TestRedisCacheRepository:
         assert await redis_repository.delete("non-existing-key") == 0
         assert await redis_repository.get(key) is None
 
+    @pytest.mark.anyio
+    async def test_can_delete_if_equal(self, redis_repository, redis_connection):
+        key = self.get_key()
+        await redis_connection.set(key, b"test-delete-if-equal-value", ex=100)
+        assert await redis_repository.delete_if_equal(key, b"test-delete-if-equal-other-value") == 0
+        assert await redis_repository.get(key) == b"test-delete-if-equal-value"
+        assert await redis_repository.delete_if_equal(key, b"test-delete-if-equal-value") == 1
+        assert await redis_repository.get(key) is None
+
     @pytest.mark.anyio
     async def test_can_delete_many(self, redis_repository, redis_connection):
         key1 = self.get_key()
@@ -188,3 +223,173 @@ class TestRedisCacheRepository:
         assert await redis_repository.get(key2) is None
         assert await redis_repository.get(key3) == b"test-delete-pattern-5-value3"
         await redis_connection.delete(key3)
+
+    @pytest.mark.anyio
+    async def test_reuses_connection(self, redis_repository):
+        async with redis_repository.session as session:
+            client_id = await session.client_id()
+        async with redis_repository.session as session:
+            assert await session.client_id() == client_id
+
+    @pytest.mark.anyio
+    async def test_reuses_pipeline(self, redis_repository):
+        async with redis_repository.session.pipeline() as pipe1:
+            await pipe1.ping()
+            assert await pipe1.execute() == [True]
+        async with redis_repository.session.pipeline() as pipe2:
+            assert pipe2 is pipe1
+            assert len(pipe2) == 0
+
+    @pytest.mark.anyio
+    async def test_can_close(self, redis_repository):
+        key = self.get_key()
+        await redis_repository.set(key, b"test-close-value", expire=100)
+        await redis_repository.close()
+        assert await redis_repository.delete(key) == 1
+
+    @pytest.mark.anyio
+    async def test_can_execute_pipeline(self, redis_repository, redis_connection):
+        key1 = self.get_key()
+        key2 = self.get_key()
+        results = await redis_repository.execute_pipeline(
+            [
+                ("set", {"key": key1, "value": b"test-pipeline-value1", "expire": 100}),
+                ("set_nx", {"key": key1, "value": b"test-pipeline-value2", "expire": 100}),
+                ("set_nx", {"key": key2, "value": b"test-pipeline-value3", "expire": 100}),
+                ("get", {"key": key1}),
+                ("delete", {"key": key2}),
+                ("get", {"key": key2}),
+            ]
+        )
+        assert results == [True, False, True, b"test-pipeline-value1", 1, None]
+        assert await redis_connection.ttl(key1) == 100
+        await redis_connection.delete(key1)
+
+    @pytest.mark.anyio
+    async def test_raises_error_on_unsupported_pipeline_operation(self, redis_repository):
+        with pytest.raises(ValueError):
+            await redis_repository.execute_pipeline([("get_many", {"keys": [self.get_key()]})])
+
+    @pytest.mark.anyio
+    async def test_can_auto_pipeline(self, redis_auto_pipeline_repository, redis_connection):
+        key1 = self.get_key()
+        key2 = self.get_key()
+        session = redis_auto_pipeline_repository.session
+        with patch.object(session, "pipeline", wraps=session.pipeline) as pipeline:
+            results = await asyncio.gather(
+                redis_auto_pipeline_repository.set(key1, b"test-auto-pipeline-value1", expire=100),
+                redis_auto_pipeline_repository.set_nx(key2, b"test-auto-pipeline-value2", expire=100),
+                redis_auto_pipeline_repository.set_nx(key2, b"test-auto-pipeline-value3", expire=100),
+                redis_auto_pipeline_repository.get("non-existing-key"),
+            )
+            assert results == [True, True, False, None]
+            # All commands of a gather are sent in a single pipeline
+            assert pipeline.call_count == 1
+            results = await asyncio.gather(
+                redis_auto_pipeline_repository.get(key1),
+                redis_auto_pipeline_repository.get_many([key1, "non-existing-key", key2]),
+                redis_auto_pipeline_repository.delete(key1),
+                redis_auto_pipeline_repository.delete_many([key2, "non-existing-key"]),
+            )
+            assert results == [
+                b"test-auto-pipeline-value1",
+                [b"test-auto-pipeline-value1", None, b"test-auto-pipeline-value2"],
+                1,
+                1,
+            ]
+            assert pipeline.call_count == 2
+        assert await redis_connection.get(key1) is None
+        assert await redis_connection.get(key2) is None
+
+    @pytest.mark.anyio
+    async def test_auto_pipeline_returns_command_errors(self, redis_auto_pipeline_repository, redis_connection):
+        key = self.get_key()
+        await redis_connection.set(key, b"test-auto-pipeline-error-value", ex=100)
+        auto_pipeline = AutoPipeline(session=redis_auto_pipeline_repository.session)
+        results = await asyncio.gather(
+            auto_pipeline.execute("lpush", key, b"test-auto-pipeline-error-item"),
+            auto_pipeline.execute("get", key),
+            return_exceptions=True,
+        )
+        assert isinstance(results[0], aioredis.ResponseError)
+        assert "WRONGTYPE" in str(results[0])
+        assert results[1] == b"test-auto-pipeline-error-value"
+        await redis_connection.delete(key)
+
+    @pytest.mark.anyio
+    async def test_auto_pipeline_skips_cancelled_callers(self, redis_auto_pipeline_repository, redis_connection):
+        key = self.get_key()
+        await redis_connection.set(key, b"test-auto-pipeline-cancel-value", ex=100)
+        auto_pipeline = AutoPipeline(session=redis_auto_pipeline_repository.session)
+        cancelled = asyncio.create_task(auto_pipeline.execute("get", key))
+        completed = asyncio.create_task(auto_pipeline.execute("get", key))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        assert await completed == b"test-auto-pipeline-cancel-value"
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        await redis_connection.delete(key)
+
+    @pytest.mark.anyio
+    async def test_auto_pipeline_fails_all_commands_on_connection_error(self):
+        connection = aioredis.from_url("redis://127.0.0.1:1/0")
+        auto_pipeline = AutoPipeline(session=RedisSession(connection=connection))
+        results = await asyncio.gather(
+            auto_pipeline.execute("get", "key1"),
+            auto_pipeline.execute("get", "key2"),
+            return_exceptions=True,
+        )
+        assert all(isinstance(result, aioredis.ConnectionError) for result in results)
+        await connection.connection_pool.disconnect()
+
+    @pytest.mark.anyio
+    async def test_can_delete_pattern_over_many_scan_pages(self, redis_connection):
+        redis_repository = RedisCacheRepository(dsn=REDIS_DSN, scan_count=2)
+        prefix = self.get_key()
+        keys = [f"{prefix}key{i}" for i in range(10)]
+        for key in keys:
+            await redis_connection.set(key, b"test-delete-pattern-pages-value", ex=100)
+        assert await redis_repository.delete_pattern(prefix + "key*") == 10
+        assert await redis_connection.exists(*keys) == 0
+        await redis_repository.session._session.connection_pool.disconnect()
+
+    @pytest.mark.anyio
+    async def test_can_delete_pattern_in_chunks(self, redis_connection):
+        redis_repository = RedisCacheRepository(dsn=REDIS_DSN, scan_count=2, unlink_chunk_size=3)
+        prefix = self.get_key()
+        keys = [f"{prefix}key{i}" for i in range(10)]
+        for key in keys:
+            await redis_connection.set(key, b"test-delete-pattern-chunks-value", ex=100)
+        assert await redis_repository.delete_pattern(prefix + "key*") == 10
+        assert await redis_connection.exists(*keys) == 0
+        await redis_repository.session._session.connection_pool.disconnect()
+
+    def test_shares_connection_per_dsn(self):
+        connection = get_redis_connection("redis://localhost:6379/0")
+        assert get_redis_connection("redis://localhost:6379/0") is connection
+        assert get_redis_connection("redis://localhost:6379/1") is not connection
+
+    @pytest.mark.anyio
+    async def test_can_use_bytes_keys(self, redis_repository, redis_connection):
+        key = self.get_key().encode()
+        assert await redis_repository.set(key, b"test-bytes-key-value", expire=100) is True
+        assert await redis_repository.get(key) == b"test-bytes-key-value"
+        assert await redis_repository.get_many([key]) == [b"test-bytes-key-value"]
+        assert await redis_repository.delete_many([key]) == 1
+
+    @pytest.mark.anyio
+    async def test_can_delete_pattern_literal(self, redis_repository, redis_connection):
+        key1 = self.get_key()
+        key2 = key1 + "suffix"
+        await redis_connection.set(key1, b"test-delete-pattern-literal-value1", ex=100)
+        await redis_connection.set(key2, b"test-delete-pattern-literal-value2", ex=100)
+        assert await redis_repository.delete_pattern(key1) == 1
+        assert await redis_repository.delete_pattern(key1) == 0
+        assert await redis_repository.get(key2) == b"test-delete-pattern-literal-value2"
+        await redis_connection.delete(key2)
+
+    def test_configures_connection_sockets(self):
+        connection_kwargs = get_redis_connection("redis://localhost:6379/0").connection_pool.connection_kwargs
+        assert connection_kwargs["socket_keepalive"] is True
+        assert connection_kwargs["socket_timeout"] == 5
+        assert connection_kwargs["retry_on_timeout"] is True
@@ -0,0 +1,169 @@
+from typing import NamedTuple, Optional
+from uuid import UUID
+
+import pytest
+from impcache import (
+    CborSerializer,
+    CompactIntJsonSerializer,
+    DecodeError,
+    EncodeError,
+    JsonDecodeError,
+    JsonEncodeError,
+    JsonSerializer,
+    MsgpackSerializer,
+    OrmsgpackSerializer,
+    SsrjsonSerializer,
+)
+
+
+class SerializerFormat(NamedTuple):
+    serializer: type
+    module: Optional[str]  # optional dependency, the format is skipped if it is not installed
+    encoded: bytes  # {"key": "value"}
+    encoded_items: tuple[bytes, bytes]  # 1 and "value"
+    invalid: bytes
+    encode_error: type[Exception]
+    decode_error: type[Exception]
+
+
+FORMATS = [
+    SerializerFormat(
+        CompactIntJsonSerializer,
+        None,
+        b'{"key":"value"}',
+        (b"1", b'"value"'),
+        b"invalid data",
+        JsonEncodeError,
+        JsonDecodeError,
+    ),
+    SerializerFormat(
+        SsrjsonSerializer,
+        "ssrjson",
+        b'{"key":"value"}',
+        (b"1", b'"value"'),
+        b"invalid data",
+        JsonEncodeError,
+        JsonDecodeError,
+    ),
+    SerializerFormat(
+        MsgpackSerializer,
+        "msgpack",
+        b"\x81\xa3key\xa5value",
+        (b"\x01", b"\xa5value"),
+        b"\xc1",
+        EncodeError,
+        DecodeError,
+    ),
+    SerializerFormat(
+        OrmsgpackSerializer,
+        "ormsgpack",
+        b"\x81\xa3key\xa5value",
+        (b"\x01", b"\xa5value"),
+        b"\xc1",
+        EncodeError,
+        DecodeError,
+    ),
+    SerializerFormat(
+        CborSerializer,
+        "cbor2",
+        b"\xa1ckeyevalue",
+        (b"\x01", b"evalue"),
+        b"\x82\x01",
+        EncodeError,
+        DecodeError,
+    ),
+]
+
+
+class TestSerializer:
+    @pytest.fixture(scope="class", params=FORMATS, ids=lambda serializer_format: serializer_format.serializer.__name__)
+    def serializer_format(self, request):
+        if request.param.module is not None:
+            pytest.importorskip(request.param.module)
+        return request.param
+
+    @pytest.fixture(scope="class")
+    def serializer(self, serializer_format):
+        return serializer_format.serializer()
+
+    def test_can_dumps(self, serializer, serializer_format):
+        assert serializer.dumps({"key": "value"}) == serializer_format.encoded
+
+    def test_can_loads(self, serializer, serializer_format):
+        assert serializer.loads(serializer_format.encoded) == {"key": "value"}
+
+    def test_can_loads_many(self, serializer, serializer_format):
+        item1, item2 = serializer_format.encoded_items
+        assert serializer.loads_many([item1, None, item2]) == [1, None, "value"]
+
+    def test_raises_error_on_dumps(self, serializer, serializer_format):
+        with pytest.raises(serializer_format.encode_error):
+            serializer.dumps(object())
+
+    def test_raises_error_on_loads(self, serializer, serializer_format):
+        with pytest.raises(serializer_format.decode_error):
+            serializer.loads(serializer_format.invalid)
+
+
+class TestCompactIntJsonSerializer:
+    @pytest.fixture(scope="class")
+    def serializer(self):
+        return CompactIntJsonSerializer()
+
+    @pytest.mark.parametrize(
+        "value, expected",
+        [
+            (-32768, b"i\x80\x00"),
+            (-129, b"i\xff\x7f"),
+            (-128, b"i\x80"),
+            (-10, b"i\xf6"),
+            (-9, b"-9"),
+            (99, b"99"),
+            (100, b"id"),
+            (1000, b"i\x03\xe8"),
+            (32767, b"i\x7f\xff"),
+            (32768, b"32768"),
+            (True, b"true"),
+            (1.5, b"1.5"),
+            ({"key": 1000}, b'{"key":1000}'),
+        ],
+    )
+    def test_can_dumps_int(self, serializer, value, expected):
+        assert serializer.dumps(value) == expected
+        assert serializer.loads(expected) == value
+
+    def test_can_loads_many_tagged(self, serializer):
+        assert serializer.loads_many([b"i\x03\xe8", None, b'"value"']) == [1000, None, "value"]
+
+
+class TestSsrjsonSerializer:
+    @pytest.fixture(scope="class")
+    def serializer(self):
+        pytest.importorskip("ssrjson")
+        return SsrjsonSerializer()
+
+    def test_can_dumps_non_finite_floats(self, serializer):
+        payload = serializer.dumps([float("nan"), float("inf"), float("-inf"), "NaN", 1.5])
+        assert payload == b'[null,null,null,"NaN",1.5]'
+        assert JsonSerializer().loads(payload) == [None, None, None, "NaN", 1.5]
+
+
+class TestMsgpackSerializer:
+    @pytest.mark.parametrize(
+        "serializer_class, module", [(MsgpackSerializer, "msgpack"), (OrmsgpackSerializer, "ormsgpack")]
+    )
+    def test_can_dumps_uuid(self, serializer_class, module):
+        pytest.importorskip(module)
+        serializer = serializer_class()
+        uuid = UUID("32bef872-f78b-4f18-82d2-e3b9376c738e")
+        assert serializer.loads(serializer.dumps(uuid)) == "32bef872-f78b-4f18-82d2-e3b9376c738e"
+
+    @pytest.mark.parametrize(
+        "serializer_class, module, error",
+        [(MsgpackSerializer, "msgpack", DecodeError), (OrmsgpackSerializer, "ormsgpack", EncodeError)],
+    )
+    def test_raises_error_on_non_str_keys(self, serializer_class, module, error):
+        pytest.importorskip(module)
+        serializer = serializer_class()
+        with pytest.raises(error):
+            serializer.loads(serializer.dumps({1: "value"}))
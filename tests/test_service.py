@@ -1,15 +1,95 @@
 import decimal
-from unittest.mock import Mock, patch
+from collections.abc import Iterator
+from typing import Any
+from unittest.mock import AsyncMock, Mock
 from uuid import UUID
 
 import pytest
-from impcache import Cache, JsonEncodeError, JsonDecodeError
+from impcache import Cache, CompactIntJsonSerializer, ICache, ISerializer, JsonEncodeError, JsonDecodeError
 from impcache.repository import IRepository
+from impcache import service
 from impcache.service import JsonSerializerMixin
 
 
+SET_MANY_DATA = {
+    "key1": "value",  # str
+    "key2": 222,  # int
+    "key3": 1.1,  # float
+    "key4": True,  # bool
+    "key5": UUID("32bef872-f78b-4f18-82d2-e3b9376c738e"),  # UUID
+    "key6": None,  # None
+    "key7": {"key": "value"},  # dict
+    "key8": [1, 2, "3"],  # list
+}
+SET_MANY_ENCODED = {
+    "key1": b'"value"',
+    "key2": b"222",
+    "key3": b"1.1",
+    "key4": b"true",
+    "key5": b'"32bef872-f78b-4f18-82d2-e3b9376c738e"',
+    "key6": b"null",
+    "key7": b'{"key":"value"}',
+    "key8": b'[1,2,"3"]',
+}
+
+
+class FakeRepository:
+    """
+    IRepository double recording every call as a (method, kwargs) tuple.
+    Method results are set in `returns`, an iterator returns its next item on every call.
+    """
+
+    def __init__(self):
+        self.calls: list[tuple[str, dict]] = []
+        self.returns: dict[str, Any] = {}
+
+    def _call(self, method: str, **kwargs) -> Any:
+        self.calls.append((method, kwargs))
+        result = self.returns.get(method)
+        return next(result) if isinstance(result, Iterator) else result
+
+    def count(self, method: str) -> int:
+        return sum(1 for name, _ in self.calls if name == method)
+
+    async def set(self, key, value, expire):
+        return self._call("set", key=key, value=value, expire=expire)
+
+    async def set_nx(self, key, value, expire):
+        return self._call("set_nx", key=key, value=value, expire=expire)
+
+    async def set_many(self, data, expire):
+        return self._call("set_many", data=data, expire=expire)
+
+    async def set_nx_many(self, data, expire):
+        return self._call("set_nx_many", data=data, expire=expire)
+
+    async def get(self, key):
+        return self._call("get", key=key)
+
+    async def get_many(self, keys):
+        return self._call("get_many", keys=keys)
+
+    async def delete(self, key):
+        return self._call("delete", key=key)
+
+    async def delete_if_equal(self, key, value):
+        return self._call("delete_if_equal", key=key, value=value)
+
+    async def delete_many(self, keys):
+        return self._call("delete_many", keys=keys)
+
+    async def delete_pattern(self, pattern):
+        return self._call("delete_pattern", pattern=pattern)
+
+    async def execute_pipeline(self, operations):
+        return self._call("execute_pipeline", operations=operations)
+
+    async def close(self):
+        return self._call("close")
+
+
 class TestJsonSerializer:
-    @pytest.fixture
+    @pytest.fixture(scope="class")
     def serializer(self):
         return JsonSerializerMixin()
 
@@ -19,6 +99,25 @@ class TestJsonSerializer:
     def test_can_loads(self, serializer):
         assert serializer.loads(b'{"key":"value"}') == {"key": "value"}
 
+    @pytest.mark.parametrize("value, expected", [(None, b"null"), (True, b"true"), (False, b"false"), (0, b"0")])
+    def test_can_dumps_singletons(self, serializer, value, expected):
+        assert serializer.dumps(value) == expected
+
+    def test_can_dumps_uuid(self, serializer):
+        uuid = UUID("32bef872-f78b-4f18-82d2-e3b9376c738e")
+        assert serializer.dumps(uuid) == b'"32bef872-f78b-4f18-82d2-e3b9376c738e"'
+
+    def test_can_dumps_numpy(self, serializer):
+        numpy = pytest.importorskip("numpy")
+        assert serializer.dumps(numpy.array([1, 2, 3])) == b"[1,2,3]"
+
+    @pytest.mark.parametrize("payload", [bytearray(b'{"key":"value"}'), memoryview(b'{"key":"value"}')])
+    def test_can_loads_bytes_like(self, serializer, payload):
+        assert serializer.loads(payload) == {"key": "value"}
+
+    def test_can_loads_many_from_tuple(self, serializer):
+        assert serializer.loads_many((b"1", None, bytearray(b'"value"'))) == [1, None, "value"]
+
     def test_raises_error_on_dumps(self, serializer):
         with pytest.raises(JsonEncodeError):
             serializer.dumps(decimal.Decimal("0.01"))
@@ -32,12 +131,18 @@ class TestCacheService:
 
     @pytest.fixture
     def repository(self):
-        return Mock(spec=IRepository)
+        return FakeRepository()
 
     @pytest.fixture
     def cache(self, repository):
         return Cache(repository=repository)
 
+    def test_interfaces_are_not_runtime_checkable(self, cache, repository):
+        with pytest.raises(TypeError):
+            isinstance(cache, ICache)
+        with pytest.raises(TypeError):
+            isinstance(repository, IRepository)
+
     def test_key_generation(self, repository):
         cache_service1 = Cache(repository=repository)
         cache_service2 = Cache(repository=repository, key_prefix="test_key_prefix")
@@ -48,146 +153,307 @@ class TestCacheService:
         assert cache_service3.make_key("test_key") == "test_key_prefix:2:test_key"
         assert cache_service4.make_key("test_key") == "test_key_prefix:v2.3.4:test_key"
 
+    def test_key_generation_after_settings_change(self, cache):
+        cache.key_prefix = "test_key_prefix"
+        assert cache.key_prefix == "test_key_prefix"
+        assert cache.make_key("test_key") == "test_key_prefix:1:test_key"
+        cache.version = "v2.3.4"
+        assert cache.version == "v2.3.4"
+        assert cache.make_key("test_key") == "test_key_prefix:v2.3.4:test_key"
+        assert cache.make_key("test_key", version=2) == "test_key_prefix:2:test_key"
+        cache.key_prefix = "other_key_prefix"
+        assert cache.make_key("test_key", version=2) == "other_key_prefix:2:test_key"
+
     @pytest.mark.anyio
-    async def test_can_set(self, cache):
+    async def test_can_use_custom_serializer(self, repository):
+        serializer = Mock(spec=ISerializer)
+        serializer.dumps.return_value = b"serialized"
+        serializer.loads.return_value = "value"
+        cache = Cache(repository=repository, serializer=serializer)
         await cache.set("key", "value", expire=100)
-        cache._repository.set.assert_called_once_with(key="cache:1:key", value=b'"value"', expire=100)
+        serializer.dumps.assert_called_once_with("value")
+        repository.returns["get"] = b"serialized"
+        assert await cache.get("key") == "value"
+        serializer.loads.assert_called_once_with(b"serialized")
+        assert repository.calls == [
+            ("set", {"key": "cache:1:key", "value": b"serialized", "expire": 100}),
+            ("get", {"key": "cache:1:key"}),
+        ]
+
+    def test_can_dumps_and_loads(self, cache, repository):
+        assert cache.dumps({"key": "value"}) == b'{"key":"value"}'
+        assert cache.loads(b'{"key":"value"}') == {"key": "value"}
+        cache = Cache(repository=repository, serializer=CompactIntJsonSerializer())
+        assert cache.dumps(1000) == b"i\x03\xe8"
+        assert cache.loads(b"i\x03\xe8") == 1000
 
     @pytest.mark.anyio
-    async def test_can_set_with_version(self, cache):
+    async def test_can_set(self, cache, repository):
+        await cache.set("key", "value", expire=100)
+        assert repository.calls == [("set", {"key": "cache:1:key", "value": b'"value"', "expire": 100})]
+
+    @pytest.mark.anyio
+    async def test_can_set_with_version(self, cache, repository):
         await cache.set("key", "value", expire=100, version=8)
-        cache._repository.set.assert_called_once_with(key="cache:8:key", value=b'"value"', expire=100)
+        assert repository.calls == [("set", {"key": "cache:8:key", "value": b'"value"', "expire": 100})]
 
     @pytest.mark.anyio
-    async def test_can_set_nx(self, cache):
+    async def test_can_set_nx(self, cache, repository):
         await cache.set_nx("key", "value", expire=100)
-        cache._repository.set_nx.assert_called_once_with(key="cache:1:key", value=b'"value"', expire=100)
+        assert repository.calls == [("set_nx", {"key": "cache:1:key", "value": b'"value"', "expire": 100})]
 
     @pytest.mark.anyio
-    async def test_can_set_nx_with_version(self, cache):
+    async def test_can_set_nx_with_version(self, cache, repository):
         await cache.set_nx("key", "value", expire=100, version="v4.2.3")
-        cache._repository.set_nx.assert_called_once_with(key="cache:v4.2.3:key", value=b'"value"', expire=100)
-
-    @pytest.mark.anyio
-    async def test_can_set_many(self, cache):
-        data = {
-            "key1": "value",  # str
-            "key2": 222,  # int
-            "key3": 1.1,  # float
-            "key4": True,  # bool
-            "key5": UUID("32bef872-f78b-4f18-82d2-e3b9376c738e"),  # UUID
-            "key6": None,  # None
-            "key7": {"key": "value"},  # dict
-            "key8": [1, 2, "3"],  # list
-        }
-        await cache.set_many(data, expire=100)
-        cache._repository.set_many.assert_called_once_with(data={
-            'cache:1:key1': b'"value"',
-            'cache:1:key2': b'222',
-            'cache:1:key3': b'1.1',
-            'cache:1:key4': b'true',
-            'cache:1:key5': b'"32bef872-f78b-4f18-82d2-e3b9376c738e"',
-            'cache:1:key6': b'null',
-            'cache:1:key7': b'{"key":"value"}',
-            'cache:1:key8': b'[1,2,"3"]',
-        }, expire=100)
-
-    @pytest.mark.anyio
-    async def test_can_set_many_with_version(self, cache):
-        data = {
-            "key1": "value",  # str
-            "key2": 222,  # int
-            "key3": 1.1,  # float
-            "key4": True,  # bool
-            "key5": UUID("32bef872-f78b-4f18-82d2-e3b9376c738e"),  # UUID
-            "key6": None,  # None
-            "key7": {"key": "value"},  # dict
-            "key8": [1, 2, "3"],  # list
-        }
-        await cache.set_many(data, expire=100, version="v5.7.1")
-        cache._repository.set_many.assert_called_once_with(data={
-            'cache:v5.7.1:key1': b'"value"',
-            'cache:v5.7.1:key2': b'222',
-            'cache:v5.7.1:key3': b'1.1',
-            'cache:v5.7.1:key4': b'true',
-            'cache:v5.7.1:key5': b'"32bef872-f78b-4f18-82d2-e3b9376c738e"',
-            'cache:v5.7.1:key6': b'null',
-            'cache:v5.7.1:key7': b'{"key":"value"}',
-            'cache:v5.7.1:key8': b'[1,2,"3"]',
-        }, expire=100)
-
-    @pytest.mark.anyio
-    async def test_can_get(self, cache):
-        with patch.object(cache._repository, "get", return_value=b'{"key":"value"}') as repository_get_mock:
-            result = await cache.get("key")
-            repository_get_mock.assert_called_once_with(key="cache:1:key")
+        assert repository.calls == [("set_nx", {"key": "cache:v4.2.3:key", "value": b'"value"', "expire": 100})]
+
+    @pytest.mark.anyio
+    @pytest.mark.parametrize("version, prefix", [(None, "cache:1:"), ("v5.7.1", "cache:v5.7.1:")])
+    async def test_can_set_many(self, cache, repository, version, prefix):
+        await cache.set_many(SET_MANY_DATA, expire=100, version=version)
+        data = {prefix + key: value for key, value in SET_MANY_ENCODED.items()}
+        assert repository.calls == [("set_many", {"data": data, "expire": 100})]
+
+    @pytest.mark.anyio
+    @pytest.mark.parametrize("version, prefix", [(None, "cache:1:"), (3, "cache:3:")])
+    async def test_can_set_nx_many(self, cache, repository, version, prefix):
+        repository.returns["set_nx_many"] = [True, False]
+        result = await cache.set_nx_many({"key1": "value1", "key2": [1, 2]}, expire=100, version=version)
+        assert result == [True, False]
+        assert repository.calls == [
+            ("set_nx_many", {"data": {f"{prefix}key1": b'"value1"', f"{prefix}key2": b"[1,2]"}, "expire": 100})
+        ]
+
+    @pytest.mark.anyio
+    async def test_can_set_raw_many(self, cache, repository):
+        data = {"key1": b'{"key":"value"}', "key2": b"[1,2]"}
+        await cache.set_raw_many(data, expire=100)
+        assert repository.calls == [("set_many", {"data": {
+            'cache:1:key1': b'{"key":"value"}',
+            'cache:1:key2': b'[1,2]',
+        }, "expire": 100})]
+
+    @pytest.mark.anyio
+    async def test_can_set_raw_many_with_version(self, cache, repository):
+        data = {"key1": b'{"key":"value"}', "key2": b"[1,2]"}
+        await cache.set_raw_many(data, expire=100, version=3)
+        assert repository.calls == [("set_many", {"data": {
+            'cache:3:key1': b'{"key":"value"}',
+            'cache:3:key2': b'[1,2]',
+        }, "expire": 100})]
+
+    @pytest.mark.anyio
+    async def test_can_get(self, cache, repository):
+        repository.returns["get"] = b'{"key":"value"}'
+        result = await cache.get("key")
+        assert repository.calls == [("get", {"key": "cache:1:key"})]
         assert result == {"key": "value"}
 
     @pytest.mark.anyio
-    async def test_can_get_with_version(self, cache):
-        with patch.object(cache._repository, "get", return_value=b'{"key":"value"}') as repository_get_mock:
-            result = await cache.get("key", version=2)
-            repository_get_mock.assert_called_once_with(key="cache:2:key")
+    async def test_can_get_with_version(self, cache, repository):
+        repository.returns["get"] = b'{"key":"value"}'
+        result = await cache.get("key", version=2)
+        assert repository.calls == [("get", {"key": "cache:2:key"})]
         assert result == {"key": "value"}
 
     @pytest.mark.anyio
-    async def test_can_get_many(self, cache):
-        return_value = [b'"value1"', None, b'"value2"']
-        with patch.object(cache._repository, "get_many", return_value=return_value) as repository_get_many_mock:
-            result = await cache.get_many(["key1", "non-existing-key", "key2"])
-            repository_get_many_mock.assert_called_once_with(
-                keys=['cache:1:key1', 'cache:1:non-existing-key', 'cache:1:key2']
-            )
+    async def test_can_get_with_negative_cache(self, repository):
+        cache = Cache(repository=repository, negative_cache_size=1)
+        assert await cache.get("key1") is None
+        assert await cache.get("key1") is None
+        assert repository.calls == [("get", {"key": "cache:1:key1"})]
+        # key2 evicts key1
+        assert await cache.get("key2") is None
+        assert await cache.get("key1") is None
+        assert repository.count("get") == 3
+        await cache.set("key1", "value", expire=100)
+        repository.returns["get"] = b'"value"'
+        assert await cache.get("key1") == "value"
+        assert repository.count("get") == 4
+
+    @pytest.mark.anyio
+    async def test_negative_cache_expires(self, repository):
+        cache = Cache(repository=repository, negative_cache_size=10, negative_cache_ttl=0)
+        assert await cache.get("key") is None
+        assert await cache.get("key") is None
+        assert repository.count("get") == 2
+
+    @pytest.mark.anyio
+    @pytest.mark.parametrize("poll_results", [[None, b'"value"'], [None, None, None]])
+    async def test_get_or_set_forgets_miss_when_locked(self, repository, monkeypatch, poll_results):
+        monkeypatch.setattr(service, "GET_OR_SET_POLL_ATTEMPTS", 2)
+        monkeypatch.setattr(service, "GET_OR_SET_POLL_INTERVAL", 0)
+        cache = Cache(repository=repository, negative_cache_size=10)
+        repository.returns["get"] = iter([*poll_results, b'"value"'])
+        repository.returns["set_nx"] = False
+        assert await cache.get_or_set("key", AsyncMock(return_value="value"), expire=100) == "value"
+        assert await cache.get("key") == "value"
+        assert repository.count("get") == len(poll_results) + 1
+
+    @pytest.mark.anyio
+    async def test_can_get_or_set_existing(self, cache, repository):
+        factory = AsyncMock()
+        repository.returns["get"] = b'"value"'
+        result = await cache.get_or_set("key", factory, expire=100)
+        assert repository.calls == [("get", {"key": "cache:1:key"})]
+        assert result == "value"
+        factory.assert_not_called()
+
+    @pytest.mark.anyio
+    async def test_can_get_or_set_missing(self, cache, repository):
+        factory = AsyncMock(return_value="value")
+        repository.returns["set_nx"] = True
+        result = await cache.get_or_set("key", factory, expire=100, version=2)
+        assert result == "value"
+        factory.assert_called_once_with()
+        lock_token = repository.calls[1][1]["value"]
+        assert repository.calls == [
+            ("get", {"key": "cache:2:key"}),
+            ("set_nx", {"key": "cache:2:key:lock", "value": lock_token, "expire": 30}),
+            ("set", {"key": "cache:2:key", "value": b'"value"', "expire": 100}),
+            ("delete_if_equal", {"key": "cache:2:key:lock", "value": lock_token}),
+        ]
+
+    @pytest.mark.anyio
+    async def test_get_or_set_uses_unique_lock_tokens(self, cache, repository):
+        repository.returns["set_nx"] = True
+        await cache.get_or_set("key", AsyncMock(return_value="value1"), expire=100)
+        await cache.get_or_set("key", AsyncMock(return_value="value2"), expire=100)
+        tokens = [kwargs["value"] for method, kwargs in repository.calls if method == "set_nx"]
+        assert len(tokens) == 2
+        assert tokens[0] != tokens[1]
+
+    @pytest.mark.anyio
+    async def test_can_get_or_set_locked(self, cache, repository):
+        factory = AsyncMock()
+        repository.returns["get"] = iter([None, None, b'"value"'])
+        repository.returns["set_nx"] = False
+        result = await cache.get_or_set("key", factory, expire=100)
+        assert result == "value"
+        factory.assert_not_called()
+        assert repository.count("set") == 0
+
+    @pytest.mark.anyio
+    async def test_get_or_set_falls_back_to_factory_when_lock_is_held(self, cache, repository, monkeypatch):
+        monkeypatch.setattr(service, "GET_OR_SET_POLL_ATTEMPTS", 3)
+        monkeypatch.setattr(service, "GET_OR_SET_POLL_INTERVAL", 0)
+        factory = AsyncMock(return_value="value")
+        repository.returns["set_nx"] = False
+        result = await cache.get_or_set("key", factory, expire=100)
+        assert result == "value"
+        factory.assert_called_once_with()
+        assert repository.count("get") == 4
+        assert repository.count("set") == 0
+        assert repository.count("delete_if_equal") == 0
+
+    @pytest.mark.anyio
+    async def test_can_get_many(self, cache, repository):
+        repository.returns["get_many"] = [b'"value1"', None, b'"value2"']
+        result = await cache.get_many(["key1", "non-existing-key", "key2"])
+        assert repository.calls == [
+            ("get_many", {"keys": ['cache:1:key1', 'cache:1:non-existing-key', 'cache:1:key2']}),
+        ]
         assert result == ["value1", None, "value2"]
 
     @pytest.mark.anyio
-    async def test_can_get_many_with_version(self, cache):
-        return_value = [b'"value1"', None, b'"value2"']
-        with patch.object(cache._repository, "get_many", return_value=return_value) as repository_get_many_mock:
-            result = await cache.get_many(["key1", "non-existing-key", "key2"], version=3)
-            repository_get_many_mock.assert_called_once_with(
-                keys=['cache:3:key1', 'cache:3:non-existing-key', 'cache:3:key2']
-            )
+    async def test_can_get_many_with_version(self, cache, repository):
+        repository.returns["get_many"] = [b'"value1"', None, b'"value2"']
+        result = await cache.get_many(["key1", "non-existing-key", "key2"], version=3)
+        assert repository.calls == [
+            ("get_many", {"keys": ['cache:3:key1', 'cache:3:non-existing-key', 'cache:3:key2']}),
+        ]
         assert result == ["value1", None, "value2"]
 
     @pytest.mark.anyio
-    async def test_can_delete(self, cache):
-        with patch.object(cache._repository, "delete", return_value=1) as repository_delete_mock:
-            result = await cache.delete("key1")
-            repository_delete_mock.assert_called_once_with(key="cache:1:key1")
+    async def test_raises_error_on_get_many(self, cache, repository):
+        repository.returns["get_many"] = [b'"value1"', b"invalid data"]
+        with pytest.raises(JsonDecodeError):
+            await cache.get_many(["key1", "key2"])
+
+    @pytest.mark.anyio
+    async def test_can_delete(self, cache, repository):
+        repository.returns["delete"] = 1
+        result = await cache.delete("key1")
+        assert repository.calls == [("delete", {"key": "cache:1:key1"})]
         assert result == 1
 
     @pytest.mark.anyio
-    async def test_can_delete_with_version(self, cache):
-        with patch.object(cache._repository, "delete", return_value=1) as repository_delete_mock:
-            result = await cache.delete("key1", version="v2.3.4")
-            repository_delete_mock.assert_called_once_with(key="cache:v2.3.4:key1")
+    async def test_can_delete_with_version(self, cache, repository):
+        repository.returns["delete"] = 1
+        result = await cache.delete("key1", version="v2.3.4")
+        assert repository.calls == [("delete", {"key": "cache:v2.3.4:key1"})]
         assert result == 1
 
     @pytest.mark.anyio
-    async def test_can_delete_many(self, cache):
-        with patch.object(cache._repository, "delete_many", return_value=2) as repository_delete_many_mock:
-            result = await cache.delete_many(["key1", "key2"])
-            repository_delete_many_mock.assert_called_once_with(keys=['cache:1:key1', 'cache:1:key2'])
+    async def test_can_delete_many(self, cache, repository):
+        repository.returns["delete_many"] = 2
+        result = await cache.delete_many(["key1", "key2"])
+        assert repository.calls == [("delete_many", {"keys": ['cache:1:key1', 'cache:1:key2']})]
         assert result == 2
 
     @pytest.mark.anyio
-    async def test_can_delete_many_with_version(self, cache):
-        with patch.object(cache._repository, "delete_many", return_value=2) as repository_delete_many_mock:
-            result = await cache.delete_many(["key1", "key2"], version=4)
-            repository_delete_many_mock.assert_called_once_with(keys=['cache:4:key1', 'cache:4:key2'])
+    async def test_can_delete_many_with_version(self, cache, repository):
+        repository.returns["delete_many"] = 2
+        result = await cache.delete_many(["key1", "key2"], version=4)
+        assert repository.calls == [("delete_many", {"keys": ['cache:4:key1', 'cache:4:key2']})]
         assert result == 2
 
     @pytest.mark.anyio
-    async def test_can_delete_pattern(self, cache):
-        with patch.object(cache._repository, "delete_pattern", return_value=2) as repository_delete_pattern_mock:
-            result = await cache.delete_pattern(pattern="h*llo")
-            repository_delete_pattern_mock.assert_called_once_with(pattern="cache:1:h*llo")
+    async def test_can_delete_pattern(self, cache, repository):
+        repository.returns["delete_pattern"] = 2
+        result = await cache.delete_pattern(pattern="h*llo")
+        assert repository.calls == [("delete_pattern", {"pattern": "cache:1:h*llo"})]
         assert result == 2
 
     @pytest.mark.anyio
-    async def test_can_delete_pattern_with_version(self, cache):
-        with patch.object(cache._repository, "delete_pattern", return_value=2) as repository_delete_pattern_mock:
-            result = await cache.delete_pattern(pattern="h*llo", version=17)
-            repository_delete_pattern_mock.assert_called_once_with(pattern="cache:17:h*llo")
+    async def test_can_delete_pattern_with_version(self, cache, repository):
+        repository.returns["delete_pattern"] = 2
+        result = await cache.delete_pattern(pattern="h*llo", version=17)
+        assert repository.calls == [("delete_pattern", {"pattern": "cache:17:h*llo"})]
         assert result == 2
+
+    @pytest.mark.anyio
+    async def test_can_pipeline(self, cache, repository):
+        repository.returns["execute_pipeline"] = [True, False, b'"value"', None, 1]
+        async with cache.pipeline() as pipe:
+            pipe.set("key1", "value1", expire=100)
+            pipe.set_nx("key2", "value2", expire=100, version=2)
+            pipe.get("key3")
+            pipe.get("key4")
+            pipe.delete("key5")
+            results = await pipe.execute()
+        assert results == [True, False, "value", None, 1]
+        assert repository.calls == [
+            (
+                "execute_pipeline",
+                {
+                    "operations": [
+                        ("set", {"key": "cache:1:key1", "value": b'"value1"', "expire": 100}),
+                        ("set_nx", {"key": "cache:2:key2", "value": b'"value2"', "expire": 100}),
+                        ("get", {"key": "cache:1:key3"}),
+                        ("get", {"key": "cache:1:key4"}),
+                        ("delete", {"key": "cache:1:key5"}),
+                    ]
+                },
+            )
+        ]
+
+    @pytest.mark.anyio
+    async def test_pipeline_executes_on_exit(self, cache, repository):
+        repository.returns["execute_pipeline"] = [1]
+        async with cache.pipeline() as pipe:
+            pipe.delete("key")
+        assert repository.calls == [("execute_pipeline", {"operations": [("delete", {"key": "cache:1:key"})]})]
+
+    @pytest.mark.anyio
+    async def test_pipeline_discards_operations_on_error(self, cache, repository):
+        with pytest.raises(RuntimeError):
+            async with cache.pipeline() as pipe:
+                pipe.delete("key")
+                raise RuntimeError
+        assert not repository.calls
+
+    @pytest.mark.anyio
+    async def test_can_close(self, cache, repository):
+        await cache.close()
+        assert repository.calls == [("close", {})]